@@ -0,0 +1,356 @@
+# agreement.py
+from __future__ import annotations
+import math
+import re
+from itertools import combinations
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from columns import DEFAULT_ARMS
+
+# ─────────────────────────────────────────────────────────────
+# 모델(arm) 간 리커트 분석 — 기준 arm(base) 대비 각 arm
+#    - 지표별 paired difference + Wilcoxon signed-rank + 클러스터(행) bootstrap CI
+#    - 평가자 간 일치도: weighted Cohen's kappa(쌍 평균), Fleiss' kappa, Krippendorff's alpha
+#    - scipy 없이 NumPy만 사용 (bootstrap은 행 리샘플 인덱스 행렬로 벡터화)
+# ─────────────────────────────────────────────────────────────
+LIKERT = (1, 2, 3, 4, 5)
+
+# arm별 점수 컬럼: {arm}_{field}
+LIKERT_FIELDS = ("quality", "comprehensiveness", "appropriateness")
+REFERENCE_ARM = "base"
+
+_RATING_RE = re.compile(r"^(.+)_(%s)$" % "|".join(LIKERT_FIELDS))
+
+
+def rating_arms(df_eval: pd.DataFrame) -> List[str]:
+    """평가 컬럼({arm}_quality 등)에서 arm 목록 (base, applied 먼저)"""
+    found: List[str] = []
+    for c in df_eval.columns:
+        m = _RATING_RE.match(str(c))
+        if m and m.group(1) not in found:
+            found.append(m.group(1))
+    return [a for a in DEFAULT_ARMS if a in found] + [a for a in found if a not in DEFAULT_ARMS]
+
+
+def rating_columns(df_eval: pd.DataFrame) -> List[str]:
+    cols = [f"{arm}_{f}" for arm in rating_arms(df_eval) for f in LIKERT_FIELDS]
+    cols.append("history_adequacy")
+    return [c for c in cols if c in df_eval.columns]
+
+
+# bootstrap 한 번에 만드는 인덱스 행렬 크기 상한 (원소 수)
+_BOOT_CHUNK_ELEMS = 1 << 22
+
+
+# 평가 단위(행) 식별 컬럼 — prepare_ratings에서 생성
+UNIT_COLUMN = "unit_id"
+
+
+def _unit_ids(df_eval: pd.DataFrame) -> pd.Series:
+    """
+    행 식별자: file_name#row_id (같은 데이터셋 기준, file_name이 중복된 행도 구분)
+    - row_id가 없으면(삭제된 행 등) file_name, file_name이 없으면 row_id
+    """
+    rid = pd.to_numeric(df_eval.get("row_id", pd.Series(np.nan, index=df_eval.index)), errors="coerce")
+    has_rid = rid.notna()
+    rid_s = rid.where(has_rid, 0).astype("int64").astype(str)
+    if "file_name" not in df_eval.columns:
+        return rid_s.where(has_rid, "")
+    fname = df_eval["file_name"].fillna("").astype(str)
+    return (fname + "#" + rid_s).where(has_rid, fname)
+
+
+def prepare_ratings(df_eval: pd.DataFrame) -> pd.DataFrame:
+    """평가 레코드 정리: 점수 숫자화, 행 식별자(UNIT_COLUMN) 생성, (행, 평가자)당 마지막 레코드만 유지"""
+    out = df_eval.copy()
+    if "reviewer" not in out.columns:
+        out["reviewer"] = ""
+    out["reviewer"] = out["reviewer"].fillna("").astype(str)
+    for c in rating_columns(out):
+        out[c] = pd.to_numeric(out[c], errors="coerce")
+    out[UNIT_COLUMN] = _unit_ids(out)
+    if "ts" in out.columns:
+        out = out.sort_values("ts", kind="stable")
+    return out.drop_duplicates([UNIT_COLUMN, "reviewer"], keep="last").reset_index(drop=True)
+
+
+# ───────────────── paired statistics ─────────────────
+def wilcoxon_signed_rank(d: np.ndarray) -> Tuple[float, float, float]:
+    """
+    Wilcoxon signed-rank (0 차이 제외, 동순위 보정 + 연속성 보정 정규근사)
+    반환: (W+, z, 양측 p)
+    """
+    d = np.asarray(d, dtype=float)
+    d = d[np.isfinite(d) & (d != 0)]
+    n = d.size
+    if n == 0:
+        return float("nan"), float("nan"), float("nan")
+    ranks = pd.Series(np.abs(d)).rank(method="average").to_numpy()
+    w_plus = float(ranks[d > 0].sum())
+    _, ties = np.unique(np.abs(d), return_counts=True)
+    var = n * (n + 1) * (2 * n + 1) / 24.0 - float((ties ** 3 - ties).sum()) / 48.0
+    if var <= 0:
+        return w_plus, float("nan"), float("nan")
+    diff = w_plus - n * (n + 1) / 4.0
+    z = (diff - 0.5 * np.sign(diff)) / math.sqrt(var)
+    return w_plus, float(z), math.erfc(abs(z) / math.sqrt(2))
+
+
+def bootstrap_ratio_ci(
+    sums: np.ndarray,
+    counts: np.ndarray,
+    *,
+    n_boot: int = 10_000,
+    alpha: float = 0.05,
+    seed: Optional[int] = 0,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    클러스터 bootstrap: 행(cluster)을 복원추출해 지표별 sum(sums)/sum(counts)의 분위 CI 계산
+    - sums, counts: (n_rows, n_metrics) 행별 차이 합 / 평가 수
+    - 인덱스 행렬을 청크 단위로 만들고, 선택 횟수 행렬과의 행렬곱으로 모든 지표에 한 번에 적용
+    반환: (low, high) 각 (n_metrics,)
+    """
+    sums = np.asarray(sums, dtype=float)
+    counts = np.asarray(counts, dtype=float)
+    n_rows, n_metrics = sums.shape
+    if n_rows == 0:
+        nan = np.full(n_metrics, np.nan)
+        return nan, nan.copy()
+
+    rng = np.random.default_rng(seed)
+    chunk = max(1, _BOOT_CHUNK_ELEMS // n_rows)
+    stats = np.empty((n_boot, n_metrics))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for start in range(0, n_boot, chunk):
+            b = min(chunk, n_boot - start)
+            idx = rng.integers(0, n_rows, size=(b, n_rows))
+            # 리샘플별 행 선택 횟수 행렬 (b, n_rows) → 행렬곱으로 모든 지표 합계를 한 번에
+            offsets = (np.arange(b) * n_rows)[:, None]
+            weights = np.bincount((idx + offsets).ravel(), minlength=b * n_rows).reshape(b, n_rows)
+            weights = weights.astype(float)
+            stats[start:start + b] = (weights @ sums) / (weights @ counts)
+    low, high = np.nanquantile(stats, [alpha / 2, 1 - alpha / 2], axis=0)
+    return low, high
+
+
+def paired_summary(df_eval: pd.DataFrame, *, reference: str = REFERENCE_ARM,
+                   n_boot: int = 10_000, seed: Optional[int] = 0) -> pd.DataFrame:
+    """
+    기준 arm 대비 각 arm의 지표별 (arm − reference) 요약
+    - mean_diff 및 CI: 평가 단위 평균, 행 단위 클러스터 bootstrap (모든 비교를 한 번에 리샘플)
+    - Wilcoxon: 행별 평균 차이(평가자 평균)에 대해 수행
+    """
+    ratings = prepare_ratings(df_eval)
+    arms = rating_arms(ratings)
+    if not arms or ratings.empty:
+        return pd.DataFrame()
+    reference = reference if reference in arms else arms[0]
+    pairs = [
+        (arm, f) for arm in arms if arm != reference for f in LIKERT_FIELDS
+        if f"{arm}_{f}" in ratings.columns and f"{reference}_{f}" in ratings.columns
+    ]
+    if not pairs:
+        return pd.DataFrame()
+
+    diffs = pd.DataFrame({
+        f"{arm}_{f}": ratings[f"{arm}_{f}"] - ratings[f"{reference}_{f}"] for arm, f in pairs
+    })
+    names = list(diffs.columns)
+    grouped = diffs.groupby(ratings[UNIT_COLUMN].to_numpy(), sort=False)
+    row_sums = grouped.sum()
+    row_counts = grouped.count()
+
+    low, high = bootstrap_ratio_ci(row_sums.to_numpy(), row_counts.to_numpy(), n_boot=n_boot, seed=seed)
+
+    recs = []
+    for j, ((arm, f), name) in enumerate(zip(pairs, names)):
+        used = diffs[name].notna()
+        rated = row_counts[name] > 0
+        row_mean = row_sums.loc[rated, name] / row_counts.loc[rated, name]
+        w, z, p = wilcoxon_signed_rank(row_mean.to_numpy())
+        recs.append({
+            "comparison": f"{arm} − {reference}",
+            "metric": f,
+            "n_ratings": int(used.sum()),
+            "n_rows": int(rated.sum()),
+            "mean_reference": float(ratings.loc[used, f"{reference}_{f}"].mean()),
+            "mean_arm": float(ratings.loc[used, f"{arm}_{f}"].mean()),
+            "mean_diff": float(diffs.loc[used, name].mean()),
+            "ci_low": float(low[j]),
+            "ci_high": float(high[j]),
+            "wilcoxon_W": w,
+            "wilcoxon_z": z,
+            "p_value": p,
+        })
+    return pd.DataFrame(recs)
+
+
+# ───────────────── inter-rater agreement ─────────────────
+def _weights(k: int, kind: str) -> np.ndarray:
+    i, j = np.meshgrid(np.arange(k), np.arange(k), indexing="ij")
+    if kind == "linear":
+        return np.abs(i - j) / (k - 1)
+    return (i - j) ** 2 / (k - 1) ** 2
+
+
+def weighted_cohen_kappa(a: Sequence[float], b: Sequence[float], *, weights: str = "quadratic",
+                         categories: Sequence[int] = LIKERT) -> float:
+    """두 평가자의 weighted Cohen's kappa (weights: linear|quadratic)"""
+    a, b = np.asarray(a, dtype=float), np.asarray(b, dtype=float)
+    ok = np.isfinite(a) & np.isfinite(b)
+    if ok.sum() < 2:
+        return float("nan")
+    cats = np.asarray(categories, dtype=float)
+    k = cats.size
+    ia = np.searchsorted(cats, a[ok])
+    ib = np.searchsorted(cats, b[ok])
+    obs = np.bincount(ia * k + ib, minlength=k * k).reshape(k, k).astype(float)
+    exp = np.outer(obs.sum(1), obs.sum(0)) / obs.sum()
+    w = _weights(k, weights)
+    denom = (w * exp).sum()
+    if denom == 0:
+        return float("nan")
+    return float(1.0 - (w * obs).sum() / denom)
+
+
+def _category_counts(mat: np.ndarray, categories: Sequence[int]) -> np.ndarray:
+    """(units, raters) 점수 행렬(NaN=미평가) → (units, categories) 빈도"""
+    cats = np.asarray(categories, dtype=float)
+    return (mat[:, :, None] == cats[None, None, :]).sum(axis=1).astype(float)
+
+
+def fleiss_kappa(mat: np.ndarray, *, categories: Sequence[int] = LIKERT) -> float:
+    """Fleiss' kappa (단위별 평가자 수가 달라도 되는 일반형, 2명 이상 평가한 단위만 사용)"""
+    counts = _category_counts(np.asarray(mat, dtype=float), categories)
+    n_i = counts.sum(axis=1)
+    counts, n_i = counts[n_i >= 2], n_i[n_i >= 2]
+    if counts.shape[0] == 0:
+        return float("nan")
+    p_i = ((counts ** 2).sum(axis=1) - n_i) / (n_i * (n_i - 1))
+    p_j = counts.sum(axis=0) / counts.sum()
+    p_e = float((p_j ** 2).sum())
+    if p_e >= 1.0:
+        return float("nan")
+    return float((p_i.mean() - p_e) / (1.0 - p_e))
+
+
+def krippendorff_alpha(mat: np.ndarray, *, level: str = "ordinal",
+                       categories: Sequence[int] = LIKERT) -> float:
+    """Krippendorff's alpha (level: nominal|ordinal|interval), coincidence matrix 방식"""
+    counts = _category_counts(np.asarray(mat, dtype=float), categories)
+    m_u = counts.sum(axis=1)
+    counts, m_u = counts[m_u >= 2], m_u[m_u >= 2]
+    if counts.shape[0] == 0:
+        return float("nan")
+    w = 1.0 / (m_u - 1.0)
+    coinc = np.einsum("u,uc,uk->ck", w, counts, counts) - np.diag((w[:, None] * counts).sum(axis=0))
+    n_c = coinc.sum(axis=1)
+    n = n_c.sum()
+    if n <= 1:
+        return float("nan")
+
+    k = len(categories)
+    i, j = np.meshgrid(np.arange(k), np.arange(k), indexing="ij")
+    if level == "nominal":
+        delta = (i != j).astype(float)
+    elif level == "interval":
+        cats = np.asarray(categories, dtype=float)
+        delta = (cats[i] - cats[j]) ** 2
+    else:
+        cum = np.concatenate([[0.0], np.cumsum(n_c)])
+        lo, hi = np.minimum(i, j), np.maximum(i, j)
+        delta = (cum[hi + 1] - cum[lo] - (n_c[i] + n_c[j]) / 2.0) ** 2
+
+    d_o = (coinc * delta).sum()
+    d_e = (np.outer(n_c, n_c) * delta).sum() / (n - 1.0)
+    if d_e == 0:
+        return float("nan")
+    return float(1.0 - d_o / d_e)
+
+
+def agreement_summary(df_eval: pd.DataFrame) -> pd.DataFrame:
+    """점수 컬럼별 평가자 간 일치도 (2명 이상 평가자가 있을 때 의미 있음)"""
+    ratings = prepare_ratings(df_eval)
+    recs = []
+    for col in rating_columns(ratings):
+        wide = ratings.pivot_table(index=UNIT_COLUMN, columns="reviewer", values=col, aggfunc="last")
+        mat = wide.to_numpy(dtype=float)
+        pair_kappas = [
+            weighted_cohen_kappa(mat[:, x], mat[:, y])
+            for x, y in combinations(range(mat.shape[1]), 2)
+        ]
+        pair_kappas = [k for k in pair_kappas if np.isfinite(k)]
+        recs.append({
+            "rating": col,
+            "n_reviewers": int(mat.shape[1]),
+            "n_units_multi_rated": int((np.isfinite(mat).sum(axis=1) >= 2).sum()),
+            "cohen_kappa_qw_mean": float(np.mean(pair_kappas)) if pair_kappas else float("nan"),
+            "fleiss_kappa": fleiss_kappa(mat),
+            "krippendorff_alpha_ordinal": krippendorff_alpha(mat, level="ordinal"),
+        })
+    return pd.DataFrame(recs)
+
+
+# ───────────────── panel ─────────────────
+def _fill_reviewer(frame: pd.DataFrame, source: str) -> Tuple[pd.DataFrame, bool]:
+    """
+    빈 reviewer를 출처(파일명 / "session")로 채움
+    - 이름 없는 평가자끼리 (행, 평가자) 중복 제거에서 합쳐지지 않도록
+    """
+    reviewer = frame["reviewer"] if "reviewer" in frame.columns else pd.Series("", index=frame.index)
+    blank = reviewer.fillna("").astype(str).str.strip() == ""
+    if not blank.any():
+        return frame, False
+    frame = frame.copy()
+    frame["reviewer"] = reviewer.where(~blank, source)
+    return frame, True
+
+
+def render_agreement_panel(session_rows: List[dict]):
+    """세션 평가 + 업로드한 평가 CSV(여러 평가자)를 합쳐 arm 간(기준: base) 분석"""
+    with st.expander("Analysis — Model arms vs Base (paired stats & agreement)", expanded=False):
+        files = st.file_uploader("Evaluation CSVs (other reviewers)", type=["csv"],
+                                 accept_multiple_files=True, key="AGREEMENT_FILES")
+        include_session = st.checkbox("Include evaluations from this session", value=True,
+                                      key="AGREEMENT_INCLUDE_SESSION")
+        n_boot = int(st.number_input("Bootstrap resamples", min_value=100, max_value=100_000,
+                                     value=10_000, step=1000, key="AGREEMENT_N_BOOT"))
+
+        sources = [(f.name, pd.read_csv(f)) for f in (files or [])]
+        if include_session and session_rows:
+            sources.append(("session", pd.DataFrame(session_rows)))
+        if not sources:
+            st.caption("No evaluations yet.")
+            return
+        frames, fallback = [], []
+        for name, frame in sources:
+            frame, filled = _fill_reviewer(frame, name)
+            frames.append(frame)
+            if filled:
+                fallback.append(name)
+        if fallback:
+            st.warning(
+                "Reviewer name missing — using the source as reviewer id for: " + ", ".join(fallback)
+            )
+        df_eval = pd.concat(frames, ignore_index=True)
+
+        if not st.button("Run analysis", key="AGREEMENT_RUN", use_container_width=True):
+            return
+
+        st.markdown("**Paired differences (arm − reference)**")
+        paired = paired_summary(df_eval, n_boot=n_boot)
+        if paired.empty:
+            st.write("—")
+        else:
+            st.dataframe(paired.round(4), use_container_width=True, hide_index=True)
+
+        st.markdown("**Inter-rater agreement**")
+        agree = agreement_summary(df_eval)
+        if agree.empty:
+            st.write("—")
+        else:
+            st.dataframe(agree.round(4), use_container_width=True, hide_index=True)
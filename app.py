@@ -1,14 +1,98 @@
 # app.py
+import hashlib
+
+import numpy as np
 import pandas as pd
 import streamlit as st
 
-from columns import normalize_columns, backfill_from_raw
-from nav import render_row_picker, row_key_of, reset_inputs_for_row_if_changed
+from columns import (
+    normalize_columns, backfill_from_raw, frame_arms, frame_memory_bytes, format_bytes,
+)
+from refresh import fingerprint, incremental_refresh, remap_evaluations
+from nav import render_row_picker, row_key_of, reset_inputs_for_row_if_changed, remap_row_state
 from views import render_core_view, render_optional_sections
 from ddx_eval import render_physician_ddx_and_evaluations
+from textstore import read_csv_compressed
+from agreement import render_agreement_panel
+from ddx_match import render_overlap_panel
 
 st.set_page_config(page_title="ER DDX Viewer v3", layout="wide")
 
+# Quick Browse에서 압축 컬럼 미리보기를 만드는 최대 행 수
+QUICK_PREVIEW_MAX_ROWS = 5000
+
+
+def _read_normalized(uploaded, *, lean: bool, compress_text: bool):
+    """
+    반환: (정규화 프레임, 압축 저장소 또는 None, 압축 컬럼 행 hash 또는 None)
+    - compress_text: chunk 단위로 읽으며 긴 자유기술 컬럼을 바로 압축 (df에서는 제거)
+    """
+    if compress_text:
+        # chunk는 이 함수가 소유하므로 정규화는 항상 제자리(lean)로
+        return read_csv_compressed(uploaded, prepare=lambda chunk: normalize_columns(chunk, lean=True))
+    df_raw = pd.read_csv(uploaded, dtype=str)
+    if lean:
+        # 파싱 결과는 일반 모드와 동일(N/A, null 등도 결측 처리), 빈 칸 채우기만 제자리에서
+        df_raw.fillna("", inplace=True)
+    else:
+        df_raw = df_raw.fillna("")
+    return normalize_columns(df_raw, lean=lean), None, None
+
+
+def _upload_id(uploaded) -> str:
+    # 이름/크기가 같은 재생성 파일도 구분: 업로드마다 바뀌는 file_id, 없으면 내용 hash
+    file_id = getattr(uploaded, "file_id", None)
+    if file_id:
+        return str(file_id)
+    return hashlib.sha1(uploaded.getvalue()).hexdigest()
+
+
+def _load_dataset(uploaded, *, lean: bool, compress_text: bool, incremental: bool):
+    """
+    업로드 파일/옵션이 그대로면 세션에 보관된 파싱 결과 재사용.
+    같은 세션에서 새 버전을 올리면(incremental) 바뀐 행만 재파싱하고 평가 row_id를 옮김.
+    """
+    sig = (_upload_id(uploaded), lean, compress_text)
+    ds = st.session_state.get("DATASET")
+    if ds is not None and ds["sig"] == sig:
+        return ds["df"], ds["text_store"]
+
+    df, text_store, text_hash = _read_normalized(uploaded, lean=lean, compress_text=compress_text)
+    fp = fingerprint(df, text_hash)
+    if ds is not None and incremental:
+        df, diff = incremental_refresh(ds["df"], ds["fp"], df, fp, prefer="applied", lean=lean)
+        flagged = remap_evaluations(st.session_state.get("V3_ROWS", []), diff)
+        remap_row_state(diff["index_map"])
+        st.session_state["REFRESH_SUMMARY"] = (
+            f"Refresh: +{len(diff['added'])} added, ~{len(diff['changed'])} changed, "
+            f"-{len(diff['removed'])} removed, {len(diff['unchanged'])} reused · "
+            f"{flagged} evaluation(s) flagged"
+        )
+    else:
+        # RAW(JSON) 및 문자열 형태에서 Expected / Differential 파생 생성 (applied/base 각각)
+        df = backfill_from_raw(df, prefer="applied", lean=lean)
+        st.session_state.pop("REFRESH_SUMMARY", None)
+
+    st.session_state["DATASET"] = {"sig": sig, "df": df, "fp": fp, "text_store": text_store}
+    return df, text_store
+
+
+def _take_columns(df, pos, cols):
+    """cols만 위치 배열(pos, None이면 전체)로 꺼낸 표시용 프레임 (전체 .loc 사본 없음)"""
+    data = {}
+    for c in cols:
+        values = df[c].to_numpy()
+        data[c] = values if pos is None else values[pos]
+    return pd.DataFrame(data, copy=False)
+
+
+def _export_csv(df, pos, text_store=None) -> bytes:
+    """필터 결과 CSV (버튼을 눌렀을 때만 생성, 압축 컬럼은 구간별로 풀어서 기록)"""
+    export_df = df if pos is None else df.take(pos)
+    if text_store is not None:
+        return text_store.to_csv(export_df).encode("utf-8-sig")
+    return export_df.to_csv(index=False).encode("utf-8-sig")
+
 
 def main():
     st.title("ER Differential Diagnosis Viewer — v3")
@@ -21,10 +105,25 @@ def main():
         st.write("⬅️ 왼쪽에서 CSV를 업로드하세요.")
         st.stop()
 
-    df_raw = pd.read_csv(uploaded, dtype=str).fillna("")
-    df = normalize_columns(df_raw)
-    # RAW(JSON) 및 문자열 형태에서 Expected / Differential 파생 생성 (applied/base 각각)
-    df = backfill_from_raw(df, prefer="applied")
+    lean = st.sidebar.checkbox("Lean mode (low memory)", value=False,
+                               help="사본/별칭 컬럼 없이 원본 프레임에서 직접 작업합니다.")
+    compress_text = st.sidebar.checkbox("Compress long free text", value=False,
+                                        help="원본 초진기록 / Current / Past History를 블록 압축 보관하고 표시·검색 시에만 해제합니다.")
+    incremental = st.sidebar.checkbox("Incremental refresh (keep evaluations)", value=True,
+                                      help="새 버전 CSV 업로드 시 바뀐 행만 다시 파싱하고 기존 평가를 유지합니다.")
+
+    df, text_store = _load_dataset(uploaded, lean=lean, compress_text=compress_text, incremental=incremental)
+    if st.session_state.get("REFRESH_SUMMARY"):
+        st.sidebar.info(st.session_state["REFRESH_SUMMARY"])
+    # 비교 대상 모델(arm): 컬럼 접미사에서 발견된 것 전체
+    arms = frame_arms(df)
+
+    # 메모리 사용량 (pod 메모리 한도 관리용)
+    mem_bytes = frame_memory_bytes(df) + (text_store.nbytes if text_store is not None else 0)
+    st.sidebar.caption(f"Rows: {len(df):,} · Memory: {format_bytes(mem_bytes)}")
+    mem_limit_mb = st.sidebar.number_input("Memory budget (MB, 0 = off)", min_value=0, value=0, step=256)
+    if mem_limit_mb and mem_bytes > mem_limit_mb * 1024 * 1024:
+        st.sidebar.warning("Memory budget exceeded — try Lean mode.")
 
     # ───────────────── Sidebar: filters & options ─────────────────
     st.sidebar.title("Filters")
@@ -43,21 +142,39 @@ def main():
     show_asso_tx = st.sidebar.checkbox("Show ASSO_TREATMENT", value=False) if has_asso_tx else False
 
     # ───────────────── Apply filter (Label 없이도 안전) ─────────────────
-    filtered = df.copy()
+    # 사본 대신 인덱스 배열로 필터 결과를 유지
+    filtered_idx = df.index
+    filtered_pos = None  # None = 전체
     if query.strip():
         q = query.lower()
 
         def s(series_like):
             return pd.Series(series_like, index=df.index, dtype="object").astype(str).str.lower()
 
+        def text_cond(col):
+            # 압축 컬럼은 블록 단위로 해제하며 검색
+            if text_store is not None and col in text_store:
+                return pd.Series(text_store.contains(col, q), index=df.index)
+            return s(df.get(col, "")).str.contains(q, na=False)
+
+        # 모든 arm의 Expected / Differentials: arm별 파생 컬럼을 직접 검색해 OR
+        arm_mask = np.zeros(len(df), dtype=bool)
+        for arm in arms:
+            exp_col = f"__exp_name_{arm}__"
+            if exp_col in df.columns:
+                arm_mask |= s(df[exp_col]).str.contains(q, na=False).to_numpy()
+            ddx_col = f"__ddx_names_{arm}__"
+            if ddx_col in df.columns:
+                arm_mask |= np.fromiter(
+                    (isinstance(v, list) and any(q in str(x).lower() for x in v) for v in df[ddx_col]),
+                    dtype=bool, count=len(df),
+                )
+
         conds = [
             s(df["file_name"]).str.contains(q, na=False),
-            s(df.get("__exp_name_applied__", "")).str.contains(q, na=False),
-            s(df.get("__exp_name_base__", "")).str.contains(q, na=False),
-            s(df.get("__ddx_names_applied__", "")).str.contains(q, na=False),
-            s(df.get("__ddx_names_base__", "")).str.contains(q, na=False),
-            s(df.get("Current History", "")).str.contains(q, na=False),
-            s(df.get("Past History", "")).str.contains(q, na=False),
+            pd.Series(arm_mask, index=df.index),
+            text_cond("Current History"),
+            text_cond("Past History"),
         ]
         # 과거 통합 컬럼 호환(있을 경우만)
         if "Expected Diagnosis" in df.columns:
@@ -68,14 +185,15 @@ def main():
         mask = conds[0]
         for c in conds[1:]:
             mask = mask | c
-        filtered = df[mask]
+        filtered_pos = np.flatnonzero(mask.to_numpy())
+        filtered_idx = df.index[filtered_pos]
 
     # ───────────────── Layout ─────────────────
     left, right = st.columns([2.2, 1.6], gap="large")
 
     with left:
         # 행 선택 + Prev/Next (KeyError 없는 format_func를 nav.py에서 처리)
-        has_row, selected_idx, row = render_row_picker(filtered)
+        has_row, selected_idx, row = render_row_picker(df, filtered_idx)
         if not has_row:
             st.stop()
 
@@ -83,7 +201,7 @@ def main():
         reset_inputs_for_row_if_changed(selected_idx)
 
         # Core view (Expected & Differential을 표로, 모델 DDX는 버튼으로 토글)
-        render_core_view(row)
+        render_core_view(row, text_store=text_store, arms=arms)
 
         # Optional sections
         render_optional_sections(
@@ -93,15 +211,17 @@ def main():
             show_asso_sx=show_asso_sx,
             show_asso_dx=show_asso_dx,
             show_asso_tx=show_asso_tx,
+            text_store=text_store,
         )
 
     with right:
-        # v3 핵심: 의사 DDX 작성 + (Base/Applied) 리커트 + History 리커트 + 코멘트 + 저장/점프/다운로드
+        # v3 핵심: 의사 DDX 작성 + (arm별) 리커트 + History 리커트 + 코멘트 + 저장/점프/다운로드
         render_physician_ddx_and_evaluations(
             row=row,
             selected_idx=int(selected_idx),
             all_indices=list(df.index),
             df_all=df,
+            arms=arms,
         )
 
     # ───────────────── Bottom quick browse ─────────────────
@@ -117,32 +237,50 @@ def main():
         # 통합 컬럼이 있는 경우(구버전 호환)
         "Expected Diagnosis",
         "Differential Diagnoses list",
-        # 분리 표준 컬럼(신규)
-        "Expected Diagnosis (applied)",
-        "Differential Diagnoses (applied)",
-        "Expected Diagnosis (base)",
-        "Differential Diagnoses (base)",
     ]
-    quick_cols = [c for c in quick_cols_pref if c in filtered.columns]
+    # 분리 표준 컬럼(신규): applied 먼저, 이후 arm 순서
+    for arm in sorted(arms, key=lambda a: a != "applied"):
+        quick_cols_pref += [f"Expected Diagnosis ({arm})", f"Differential Diagnoses ({arm})"]
+    quick_cols = [c for c in quick_cols_pref if c in df.columns]
     if not quick_cols:
         quick_cols = ["file_name"]
+    quick_df = _take_columns(df, filtered_pos, quick_cols)
+
+    # 압축 컬럼은 미리보기(앞부분)로 표시 — 행이 많으면 해제 비용 때문에 생략
+    packed = [c for c in quick_cols_pref if text_store is not None and c in text_store]
+    if packed:
+        if len(filtered_idx) <= QUICK_PREVIEW_MAX_ROWS:
+            for i, c in enumerate(packed):  # file_name 바로 뒤, 원래 순서대로
+                quick_df.insert(1 + i, c, text_store.preview(c, filtered_idx))
+        else:
+            st.caption(
+                f"{', '.join(packed)}: compressed — previews shown for ≤ {QUICK_PREVIEW_MAX_ROWS:,} rows "
+                "(narrow the search to see them)."
+            )
 
     st.dataframe(
-        filtered[quick_cols].reset_index(drop=True),
+        quick_df,
         use_container_width=True,
-        height=320
+        height=320,
+        hide_index=True,
     )
 
     # ───────────────── Export filtered ─────────────────
     st.markdown("---")
     st.caption("Export (filtered)")
-    csv_bytes = filtered.to_csv(index=False).encode("utf-8-sig")
-    st.download_button(
-        "Download filtered CSV",
-        data=csv_bytes,
-        file_name="filtered_results_v3.csv",
-        mime="text/csv"
-    )
+    # rerun마다 CSV를 만들지 않도록 버튼을 눌렀을 때만 생성
+    if st.button("Prepare filtered CSV", key="EXPORT_PREPARE"):
+        st.download_button(
+            "Download filtered CSV",
+            data=_export_csv(df, filtered_pos, text_store),
+            file_name="filtered_results_v3.csv",
+            mime="text/csv"
+        )
+
+    # ───────────────── Analysis (Base vs Applied) ─────────────────
+    st.markdown("---")
+    render_agreement_panel(st.session_state.get("V3_ROWS", []))
+    render_overlap_panel(st.session_state.get("V3_ROWS", []), df)
 
 
 if __name__ == "__main__":
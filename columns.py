@@ -1,14 +1,16 @@
 # columns.py
 import json
 import re
+import sys
 import ast
+import numpy as np
 import pandas as pd
 from typing import Dict, Any, List, Tuple, Optional
 
 # ─────────────────────────────────────────────────────────────
 # 1) 컬럼 정규화
-#    - applied/base를 동일 키로 합치지 않도록 주의!
-#    - 각 버전을 별도로 표준화하고, generic은 backfill에서 채운다.
+#    - arm(base/applied/...)별 컬럼을 동일 키로 합치지 않도록 주의!
+#    - arm은 컬럼 접미사(llm_eval_raw_<arm> 등)에서 찾아 각각 표준화하고, generic은 backfill에서 채운다.
 # ─────────────────────────────────────────────────────────────
 CANON = {
     "file_name": ["file_name"],
@@ -20,34 +22,89 @@ CANON = {
     "ASSO_SX_SN": ["ASSO_SX_SN"],
     "ASSO_DISEASE": ["ASSO_DISEASE"],
     "ASSO_TREATMENT": ["ASSO_TREATMENT"],
+}
+
+# 비교 대상 모델(arm) — 컬럼에서 찾지 못하면 기본값 사용
+DEFAULT_ARMS = ("base", "applied")
 
+# arm별 표준 컬럼 템플릿: 표준명 → 원본 후보
+ARM_CANON = {
     # LLM raw(JSON) 결과 (있으면 파싱에 사용)
-    "llm_eval_raw_base": ["llm_eval_raw_base"],
-    "llm_eval_raw_applied": ["llm_eval_raw_applied"],
+    "llm_eval_raw_{arm}": ["llm_eval_raw_{arm}"],
 
-    # applied/base를 별도 표준 컬럼으로 보존
-    "Expected Diagnosis (applied)": ["expected_diagnosis_applied"],
-    "Differential Diagnoses (applied)": ["differential_diagnoses_applied"],
-    "Expected Diagnosis (base)": ["expected_diagnosis_base"],
-    "Differential Diagnoses (base)": ["differential_diagnoses_base"],
+    # arm별 표준 컬럼으로 보존
+    "Expected Diagnosis ({arm})": ["expected_diagnosis_{arm}"],
+    "Differential Diagnoses ({arm})": ["differential_diagnoses_{arm}"],
 
     # (예전 호환) LLM 평가 라벨 (있어도 v3에서는 기본 숨김)
-    "Llm Evaluation Label (applied/strict)": ["llm_eval_label_applied_strict"],
-    "Llm Evaluation Label (applied/lenient)": ["llm_eval_label_applied_lenient"],
-    "Llm Evaluation Label (base/strict)": ["llm_eval_label_base_strict"],
-    "Llm Evaluation Label (base/lenient)": ["llm_eval_label_base_lenient"],
+    "Llm Evaluation Label ({arm}/strict)": ["llm_eval_label_{arm}_strict"],
+    "Llm Evaluation Label ({arm}/lenient)": ["llm_eval_label_{arm}_lenient"],
 }
 
-def normalize_columns(df: pd.DataFrame) -> pd.DataFrame:
+# 통합 컬럼(구버전) 호환: 해당 arm이 비었을 때만 사용
+_LEGACY_FALLBACK = {"applied": ("Expected Diagnosis", "Differential Diagnoses list")}
+
+_ARM_PATTERNS = [
+    re.compile(r"^llm_eval_raw_(.+)$"),
+    re.compile(r"^expected_diagnosis_(.+)$"),
+    re.compile(r"^differential_diagnoses_(.+)$"),
+    re.compile(r"^Expected Diagnosis \((.+)\)$"),
+    re.compile(r"^Differential Diagnoses \((.+)\)$"),
+]
+
+def discover_arms(columns) -> List[str]:
+    """컬럼 접미사에서 arm 목록 추출 (base, applied 먼저, 나머지는 컬럼 순서)"""
+    found: List[str] = []
+    for c in columns:
+        for pat in _ARM_PATTERNS:
+            m = pat.match(str(c))
+            if m and m.group(1) not in found:
+                found.append(m.group(1))
+                break
+    if not found:
+        return list(DEFAULT_ARMS)
+    return [a for a in DEFAULT_ARMS if a in found] + [a for a in found if a not in DEFAULT_ARMS]
+
+def frame_arms(df: pd.DataFrame) -> List[str]:
+    """backfill_from_raw 이후 프레임의 arm 목록 (__exp_name_<arm>__ 기준)"""
+    return [m.group(1) for m in (re.match(r"^__exp_name_(.+)__$", str(c)) for c in df.columns) if m]
+
+def arm_source_columns(columns) -> List[str]:
+    """
+    모델 출력에 해당하는 표준 컬럼 (llm_eval_raw_* / Expected / Differential)
+    - 파싱 fallback으로 쓰는 구버전 통합 컬럼(_LEGACY_FALLBACK)도 포함
+    """
+    legacy = {c for cols in _LEGACY_FALLBACK.values() for c in cols}
+    return [c for c in columns if c in legacy or any(p.match(str(c)) for p in _ARM_PATTERNS)]
+
+def arm_label(arm: str) -> str:
+    return arm.replace("_", " ").title()
+
+def normalize_columns(df: pd.DataFrame, *, lean: bool = False, arms: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    - lean=False: 원본을 건드리지 않고 사본을 반환
+    - lean=True : 사본 없이 원본 프레임의 컬럼명을 제자리에서 변경 (호출자가 원본을 소유할 때만)
+    - arms: 미지정 시 discover_arms()로 컬럼에서 찾음
+    """
+    arms = arms or discover_arms(df.columns)
+    canon: Dict[str, List[str]] = dict(CANON)
+    for arm in arms:
+        for tmpl, candidates in ARM_CANON.items():
+            canon[tmpl.format(arm=arm)] = [c.format(arm=arm) for c in candidates]
+
     rename_map: Dict[str, str] = {}
-    for canon, candidates in CANON.items():
+    for k, candidates in canon.items():
         for c in candidates:
             if c in df.columns:
-                rename_map[c] = canon
+                rename_map[c] = k
                 break
-    out = df.rename(columns=rename_map).copy()
+    if lean:
+        df.rename(columns=rename_map, inplace=True)
+        out = df
+    else:
+        out = df.rename(columns=rename_map).copy()
     # ensure all canon columns exist
-    for k in CANON.keys():
+    for k in canon.keys():
         if k not in out.columns:
             out[k] = ""
     return out
@@ -172,14 +229,16 @@ def _mk_rows(expected: str, diffs: List[str]) -> List[Dict[str, str]]:
 
 # ─────────────────────────────────────────────────────────────
 # 3) backfill_from_raw
-#    - llm_eval_raw_* → 우선 파싱
-#    - 없으면 Expected/Diff (applied/base) 표준 컬럼에서 파싱
+#    - llm_eval_raw_<arm> → 우선 파싱
+#    - 없으면 Expected/Diff (<arm>) 표준 컬럼에서 파싱
+#    - arm별로 해당 컬럼만 순회 → 결과를 바로 arm별 컬럼(__exp_name_<arm>__ 등)에 적재
 #    - __ddx_table_* 및 generic(*prefer*) 컬럼까지 생성
 # ─────────────────────────────────────────────────────────────
-def _extract_from_llm_raw(row: pd.Series, which: str) -> Tuple[str, str, List[str], List[str]]:
-    """llm_eval_raw_{which}에서 expected.name/tier, differentials[].name/tier를 추출"""
-    raw_col = f"llm_eval_raw_{which}"
-    obj = _safe_json_load(row.get(raw_col, ""))
+ARM_FIELDS = ("exp_name", "exp_tier", "ddx_names", "ddx_tiers")
+
+def _extract_from_llm_raw(raw: Any) -> Tuple[str, str, List[str], List[str]]:
+    """llm_eval_raw_<arm> 값에서 expected.name/tier, differentials[].name/tier를 추출"""
+    obj = _safe_json_load(raw)
     if not isinstance(obj, dict):
         return "", "", [], []
     exp = obj.get("expected") or {}
@@ -196,82 +255,137 @@ def _extract_from_llm_raw(row: pd.Series, which: str) -> Tuple[str, str, List[st
             ddx_tiers.append("")
     return exp_name, exp_tier, ddx_names, ddx_tiers
 
-def backfill_from_raw(df: pd.DataFrame, prefer: str = "applied") -> pd.DataFrame:
+def _column_or_blank(df: pd.DataFrame, col: str) -> List[Any]:
+    return df[col].tolist() if col in df.columns else [""] * len(df)
+
+def _parse_arm(df: pd.DataFrame, arm: str) -> Dict[str, List[Any]]:
+    """arm 하나의 컬럼만 읽어 ARM_FIELDS별 리스트 생성"""
+    raws = _column_or_blank(df, f"llm_eval_raw_{arm}")
+    exps = _column_or_blank(df, f"Expected Diagnosis ({arm})")
+    diffs = _column_or_blank(df, f"Differential Diagnoses ({arm})")
+    legacy_exp_col, legacy_diff_col = _LEGACY_FALLBACK.get(arm, ("", ""))
+    legacy_exps = _column_or_blank(df, legacy_exp_col)
+    legacy_diffs = _column_or_blank(df, legacy_diff_col)
+
+    out: Dict[str, List[Any]] = {f: [] for f in ARM_FIELDS}
+    for raw, e, d, le, ld in zip(raws, exps, diffs, legacy_exps, legacy_diffs):
+        # 1) 우선 llm_eval_raw_<arm>에서 시도
+        name, tier, names, tiers = _extract_from_llm_raw(raw)
+        # 2) 실패 시 표준 컬럼에서 보완
+        if not name:
+            name = _parse_expected(e) or _parse_expected(le)
+        if not names:
+            names = _parse_diffs(d) or _parse_diffs(ld)
+        if not tiers:
+            tiers = [""] * len(names)
+        out["exp_name"].append(name); out["exp_tier"].append(tier)
+        out["ddx_names"].append(names); out["ddx_tiers"].append(tiers)
+    return out
+
+def backfill_from_raw(df: pd.DataFrame, prefer: str = "applied", *, lean: bool = False,
+                      arms: Optional[List[str]] = None) -> pd.DataFrame:
     """
-    - applied/base 각각에 대해 Expected/Diff를 안전 파싱하여 별도 컬럼(__exp_name_*__, __ddx_names_*__ 등)에 적재
-    - Core View 표용 __ddx_table_base__/__ddx_table_applied__ 생성
-    - prefer(applied|base)에 따라 generic(__exp_name__, __ddx_names__ 등) 채움
+    - arm마다 Expected/Diff를 안전 파싱하여 별도 컬럼(__exp_name_<arm>__, __ddx_names_<arm>__ 등)에 적재
+    - Core View 표용 __ddx_table_<arm>__ 생성
+    - prefer(arm 이름, 없으면 첫 arm)에 따라 generic(__exp_name__, __ddx_names__ 등) 채움
+    - lean=True: 사본 없이 df에 직접 적재하고, 별칭 컬럼(__ddx_table_*__, *_only, generic)은
+      저장하지 않음 → get_derived()로 접근 시 계산
     """
-    out = df.copy()
+    out = df if lean else df.copy()
+    arms = arms or discover_arms(out.columns)
 
-    # applied
-    exp_name_app, exp_tier_app, ddx_names_app, ddx_tiers_app = [], [], [], []
-    # base
-    exp_name_base, exp_tier_base, ddx_names_base, ddx_tiers_base = [], [], [], []
+    # 상세 저장: arm 하나씩 파싱해 곧바로 arm별 컬럼으로 (중간 프레임 없음)
+    for arm in arms:
+        parsed = _parse_arm(out, arm)
+        for f in ARM_FIELDS:
+            out[f"__{f}_{arm}__"] = parsed[f]
 
-    for _, row in out.iterrows():
-        # 1) 우선 llm_eval_raw_*에서 시도
-        a_name, a_tier, a_names, a_tiers = _extract_from_llm_raw(row, "applied")
-        b_name, b_tier, b_names, b_tiers = _extract_from_llm_raw(row, "base")
+    if lean:
+        return out
 
-        # 2) 실패 시 표준 컬럼에서 보완
-        if not a_name:
-            # Expected Diagnosis (applied) 가 있으면 사용
-            a_name = _parse_expected(row.get("Expected Diagnosis (applied)", "")) \
-                     or _parse_expected(row.get("Expected Diagnosis", ""))  # 매우 예외적 호환
-        if not a_names:
-            a_names = _parse_diffs(row.get("Differential Diagnoses (applied)", "")) \
-                      or _parse_diffs(row.get("Differential Diagnoses list", ""))  # 매우 예외적 호환
-        if not a_tiers:
-            a_tiers = [""] * len(a_names)
-
-        if not b_name:
-            b_name = _parse_expected(row.get("Expected Diagnosis (base)", ""))
-        if not b_names:
-            b_names = _parse_diffs(row.get("Differential Diagnoses (base)", ""))
-        if not b_tiers:
-            b_tiers = [""] * len(b_names)
-
-        exp_name_app.append(a_name); exp_tier_app.append(a_tier); ddx_names_app.append(a_names); ddx_tiers_app.append(a_tiers)
-        exp_name_base.append(b_name); exp_tier_base.append(b_tier); ddx_names_base.append(b_names); ddx_tiers_base.append(b_tiers)
-
-    # 상세 저장
-    out["__exp_name_applied__"]  = exp_name_app
-    out["__exp_tier_applied__"]  = exp_tier_app
-    out["__ddx_names_applied__"] = ddx_names_app
-    out["__ddx_tiers_applied__"] = ddx_tiers_app
-
-    out["__exp_name_base__"]  = exp_name_base
-    out["__exp_tier_base__"]  = exp_tier_base
-    out["__ddx_names_base__"] = ddx_names_base
-    out["__ddx_tiers_base__"] = ddx_tiers_base
-
-    # Core View 표용
-    out["__ddx_table_applied__"] = [
-        _mk_rows(e, ds) for e, ds in zip(out["__exp_name_applied__"], out["__ddx_names_applied__"])
-    ]
-    out["__ddx_table_base__"] = [
-        _mk_rows(e, ds) for e, ds in zip(out["__exp_name_base__"], out["__ddx_names_base__"])
-    ]
-
-    # (레거시) 이름만 합친 리스트
-    out["__ddx_names__applied_only"] = [
-        list(dict.fromkeys(([e] if e else []) + ds)) for e, ds in zip(out["__exp_name_applied__"], out["__ddx_names_applied__"])
-    ]
-    out["__ddx_names__base_only"] = [
-        list(dict.fromkeys(([e] if e else []) + ds)) for e, ds in zip(out["__exp_name_base__"], out["__ddx_names_base__"])
-    ]
+    for arm in arms:
+        exps, ddxs = out[f"__exp_name_{arm}__"], out[f"__ddx_names_{arm}__"]
+        # Core View 표용
+        out[f"__ddx_table_{arm}__"] = [_mk_rows(e, ds) for e, ds in zip(exps, ddxs)]
+        # (레거시) 이름만 합친 리스트
+        out[f"__ddx_names__{arm}_only"] = [
+            list(dict.fromkeys(([e] if e else []) + ds)) for e, ds in zip(exps, ddxs)
+        ]
 
     # generic (prefer 우선) — 기존 코드 호환을 위해 제공
-    if prefer == "applied":
-        out["__exp_name__"]  = out["__exp_name_applied__"]
-        out["__exp_tier__"]  = out["__exp_tier_applied__"]
-        out["__ddx_names__"] = out["__ddx_names_applied__"]
-        out["__ddx_tiers__"] = out["__ddx_tiers_applied__"]
-    else:
-        out["__exp_name__"]  = out["__exp_name_base__"]
-        out["__exp_tier__"]  = out["__exp_tier_base__"]
-        out["__ddx_names__"] = out["__ddx_names_base__"]
-        out["__ddx_tiers__"] = out["__ddx_tiers_base__"]
+    which = prefer if prefer in arms else arms[0]
+    for col in _GENERIC_ALIASES:
+        out[col] = out[f"{col[:-2]}_{which}__"]
+
+    return out
+
+
+# ─────────────────────────────────────────────────────────────
+# 4) lean 모드 지원
+#    - 별칭/파생 컬럼을 저장하지 않고 행 단위로 계산
+#    - 프레임 메모리 사용량 보고
+# ─────────────────────────────────────────────────────────────
+_GENERIC_ALIASES = ("__exp_name__", "__exp_tier__", "__ddx_names__", "__ddx_tiers__")
+
+def get_derived(row: pd.Series, col: str, prefer: str = "applied") -> Any:
+    """
+    파생 컬럼 값을 반환. 저장돼 있으면 그대로, lean 모드로 생략된 별칭이면 즉석 계산
+    - __ddx_table_<arm>__     → _mk_rows(Expected, Differentials)
+    - __ddx_names__<arm>_only → Expected + Differentials (중복 제거)
+    - __exp_name__ 등 generic  → prefer 버전의 상세 컬럼
+    """
+    if col in row.index:
+        return row[col]
+    if col in _GENERIC_ALIASES:
+        # backfill_from_raw와 같은 규칙: prefer arm이 없으면 첫 arm
+        which = prefer
+        if f"__exp_name_{prefer}__" not in row.index:
+            first = next((m for m in (re.match(r"^__exp_name_(.+)__$", str(c)) for c in row.index) if m), None)
+            which = first.group(1) if first else prefer
+        return row.get(f"{col[:-2]}_{which}__", "")
+    m = re.match(r"^__ddx_table_(.+)__$", col) or re.match(r"^__ddx_names__(.+)_only$", col)
+    if m is None:
+        return None
+    exp = row.get(f"__exp_name_{m.group(1)}__", "") or ""
+    ds = row.get(f"__ddx_names_{m.group(1)}__", None)
+    ds = ds if isinstance(ds, list) else []
+    if col.startswith("__ddx_table_"):
+        return _mk_rows(exp, ds)
+    return list(dict.fromkeys(([exp] if exp else []) + ds))
+
+_MEM_SAMPLE_ROWS = 1000
+
+def _nested_bytes(val) -> int:
+    # list/dict 안쪽 원소 크기 (deep=True는 컨테이너 객체 자체만 셈)
+    if isinstance(val, dict):
+        return sum(sys.getsizeof(k) + sys.getsizeof(v) + _nested_bytes(v) for k, v in val.items())
+    if isinstance(val, (list, tuple)):
+        return sum(sys.getsizeof(x) + _nested_bytes(x) for x in val)
+    return 0
+
+def frame_memory_bytes(df: pd.DataFrame) -> int:
+    """
+    인덱스 포함 프레임 메모리 사용량(bytes, object 컬럼은 deep 측정)
+    - list/dict를 담은 object 컬럼(__ddx_names_*__ 등)은 원소 크기를 표본(최대 1000행)으로 추정해 더함
+    """
+    total = int(df.memory_usage(index=True, deep=True).sum())
+    n = len(df)
+    if n == 0:
+        return total
+    pos = np.unique(np.linspace(0, n - 1, min(n, _MEM_SAMPLE_ROWS)).astype(int))
+    for j in range(df.shape[1]):
+        col = df.iloc[:, j]
+        if col.dtype != object:
+            continue
+        nested = sum(_nested_bytes(v) for v in col.iloc[pos])
+        if nested:
+            total += int(nested * n / len(pos))
+    return total
 
-    return out
\ No newline at end of file
+def format_bytes(n: int) -> str:
+    size = float(n)
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
@@ -5,6 +5,21 @@ import pandas as pd
 import streamlit as st
 from typing import Dict, Any, List, Sequence
 
+from columns import DEFAULT_ARMS, arm_label
+
+# arm별 리커트 항목: (키 코드, 레코드 필드, 라벨)
+LIKERT_ITEMS = (
+    ("QLT", "quality", "Quality: inclusion of final diagnosis"),
+    ("COMP", "comprehensiveness", "Comprehensiveness"),
+    ("APPR", "appropriateness", "Appropriateness"),
+)
+# 기존 세션 키 호환 (BASE_QLT_…, APP_QLT_…)
+_ARM_KEY_PREFIX = {"base": "BASE", "applied": "APP"}
+
+def _likert_key(arm: str, code: str, rk: str) -> str:
+    prefix = _ARM_KEY_PREFIX.get(arm, f"ARM_{arm}")
+    return f"{prefix}_{code}_{rk}"
+
 def _init_store():
     if "V3_ROWS" not in st.session_state:
         st.session_state.V3_ROWS: List[Dict[str, Any]] = []
@@ -35,9 +50,10 @@ def render_physician_ddx_and_evaluations(
     selected_idx: int,
     all_indices: Sequence[int],
     df_all: pd.DataFrame,
+    arms: Sequence[str] = DEFAULT_ARMS,
 ):
     """
-    의사 DDX 작성 + 모델(Base/Applied) 각각 3개 리커트 + History(1개) + 코멘트 + 저장/자동 이동
+    의사 DDX 작성 + 모델(arm)마다 3개 리커트 + History(1개) + 코멘트 + 저장/자동 이동
     """
     _init_store()
     rk = f"row_{int(selected_idx)}"
@@ -56,13 +72,18 @@ def render_physician_ddx_and_evaluations(
             st.checkbox("Save 후 다음 미평가 행으로 자동 이동", key="AUTO_ADVANCE_ON_SAVE")
         with c2:
             st.write(f"**File:** {row.get('file_name','')}")
-            st.caption("Model(Base vs Applied) 비교 + Physician DDX + History 평가")
+            st.caption(f"Model({' vs '.join(arm_label(a) for a in arms)}) 비교 + Physician DDX + History 평가")
 
         evaluated_ids = [rec.get("row_id") for rec in st.session_state.V3_ROWS]
         done = len(set(e for e in evaluated_ids if e is not None))
         total_rows = len(all_indices)
         st.progress(done / total_rows if total_rows else 0.0, text=f"Progress: {done}/{total_rows} rows evaluated")
 
+        # 증분 새로고침 후 모델 출력이 바뀐 행의 기존 평가 → 재평가 안내
+        cur_rec = next((r for r in st.session_state.V3_ROWS if r.get("row_id") == int(selected_idx)), None)
+        if cur_rec is not None and cur_rec.get("model_output_changed"):
+            st.warning("이 행의 모델 출력이 평가 이후 변경되었습니다. 다시 평가 후 저장하세요.")
+
 
         # ---- 폼 ----
         with st.form(key=f"v3_form_{rk}", clear_on_submit=False):
@@ -76,28 +97,17 @@ def render_physician_ddx_and_evaluations(
                 height=120,
             )
 
-            st.markdown("**2) Model (Base) — Likert (1–5)**")
-            b1, b2, b3 = st.columns(3)
-            with b1:
-                base_quality = st.slider("Quality: inclusion of final diagnosis", 1, 5, 3, key=f"BASE_QLT_{rk}")
-            with b2:
-                base_comp   = st.slider("Comprehensiveness", 1, 5, 3, key=f"BASE_COMP_{rk}")
-            with b3:
-                base_appr   = st.slider("Appropriateness", 1, 5, 3, key=f"BASE_APPR_{rk}")
-
-            st.markdown("**3) Model (Applied) — Likert (1–5)**")
-            a1, a2, a3 = st.columns(3)
-            with a1:
-                app_quality = st.slider("Quality: inclusion of final diagnosis ", 1, 5, 3, key=f"APP_QLT_{rk}")
-            with a2:
-                app_comp    = st.slider("Comprehensiveness ", 1, 5, 3, key=f"APP_COMP_{rk}")
-            with a3:
-                app_appr    = st.slider("Appropriateness ", 1, 5, 3, key=f"APP_APPR_{rk}")
-
-            st.markdown("**4) History Adequacy (Current + Past) — Likert (1–5)**")
-            hist_score = st.slider("History adequacy", 1, 5, 3, key=f"HIST_SCORE_{rk}")
-
-            comment = st.text_area("Comment (선택)", value="", key=f"COMMENT_{rk}", height=80)
+            # 2..) 모델(arm)별 3개 리커트
+            for n, arm in enumerate(arms, start=2):
+                st.markdown(f"**{n}) Model ({arm_label(arm)}) — Likert (1–5)**")
+                for col, (code, _, label) in zip(st.columns(len(LIKERT_ITEMS)), LIKERT_ITEMS):
+                    with col:
+                        st.slider(label, 1, 5, 3, key=_likert_key(arm, code, rk))
+
+            st.markdown(f"**{len(arms) + 2}) History Adequacy (Current + Past) — Likert (1–5)**")
+            st.slider("History adequacy", 1, 5, 3, key=f"HIST_SCORE_{rk}")
+
+            st.text_area("Comment (선택)", value="", key=f"COMMENT_{rk}", height=80)
 
             saved = st.form_submit_button("Save evaluation", use_container_width=True, type="primary")
 
@@ -110,18 +120,14 @@ def render_physician_ddx_and_evaluations(
                 "ts": int(time.time()),
                 # 의사 DDX
                 "phys_ddx": _as_list(st.session_state.get(f"PHYS_DDX_{rk}", "")),
-                # Base 3점수
-                "base_quality": int(st.session_state.get(f"BASE_QLT_{rk}", 3)),
-                "base_comprehensiveness": int(st.session_state.get(f"BASE_COMP_{rk}", 3)),
-                "base_appropriateness": int(st.session_state.get(f"BASE_APPR_{rk}", 3)),
-                # Applied 3점수
-                "applied_quality": int(st.session_state.get(f"APP_QLT_{rk}", 3)),
-                "applied_comprehensiveness": int(st.session_state.get(f"APP_COMP_{rk}", 3)),
-                "applied_appropriateness": int(st.session_state.get(f"APP_APPR_{rk}", 3)),
-                # History 1점수
-                "history_adequacy": int(st.session_state.get(f"HIST_SCORE_{rk}", 3)),
-                "comment": st.session_state.get(f"COMMENT_{rk}", "").strip(),
             }
+            # arm별 3점수 ({arm}_quality / _comprehensiveness / _appropriateness)
+            for arm in arms:
+                for code, field, _ in LIKERT_ITEMS:
+                    new_rec[f"{arm}_{field}"] = int(st.session_state.get(_likert_key(arm, code, rk), 3))
+            # History 1점수
+            new_rec["history_adequacy"] = int(st.session_state.get(f"HIST_SCORE_{rk}", 3))
+            new_rec["comment"] = st.session_state.get(f"COMMENT_{rk}", "").strip()
 
             # 행 단위 덮어쓰기
             rows = st.session_state.V3_ROWS
@@ -0,0 +1,293 @@
+# ddx_match.py
+from __future__ import annotations
+import ast
+import math
+import re
+import unicodedata
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from columns import frame_arms
+from utils import to_list_from_any
+
+# ─────────────────────────────────────────────────────────────
+# DDX 리스트 자동 overlap 지표
+#    - 진단명 정규화 → trigram 색인으로 철자 변형을 같은 cluster로 묶음
+#      ("Colles' fracture" ≈ "Colles fracture")
+#    - 리스트를 cluster id로 바꾼 뒤 집합/순위 연산 → 전체 데이터셋 일괄 계산
+# ─────────────────────────────────────────────────────────────
+def normalize_term(text: str) -> str:
+    """소문자, 악센트/아포스트로피 제거, 기타 구두점 → 공백, 공백 정리"""
+    t = unicodedata.normalize("NFKD", str(text))
+    t = "".join(ch for ch in t if not unicodedata.combining(ch)).lower()
+    t = re.sub(r"['’`´]", "", t)
+    t = re.sub(r"[^\w]+", " ", t)
+    return " ".join(t.split())
+
+
+def _trigrams(term: str) -> set:
+    padded = f"  {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+_ROMAN = {"i": 1, "v": 5, "x": 10}
+_ROMAN_RE = re.compile(r"^x{0,3}(ix|iv|v?i{0,3})$")
+
+
+def _roman_value(tok: str) -> int:
+    vals = [_ROMAN[ch] for ch in tok]
+    return sum(-v if i + 1 < len(vals) and v < vals[i + 1] else v for i, v in enumerate(vals))
+
+
+def _marker_tokens(term: str) -> tuple:
+    """
+    임상적으로 다른 진단을 가르는 토큰: 숫자 포함(c5, 1), 한 글자(a, b), 로마 숫자(ii → 2)
+    - fuzzy 일치는 이 토큰들이 같을 때만 허용 (Type 1 ≠ Type 2, Hepatitis B ≠ Hepatitis C)
+    """
+    out = []
+    for tok in term.split():
+        if tok and _ROMAN_RE.match(tok):
+            out.append(str(_roman_value(tok)))
+        elif len(tok) == 1 or any(ch.isdigit() for ch in tok):
+            out.append(tok)
+    return tuple(sorted(out))
+
+
+class TermIndex:
+    """
+    정규화 진단명 trigram 색인
+    - add(): 기존 cluster 대표 용어 중 Dice 유사도가 threshold 이상인 최고 후보의 cluster에 합류, 없으면 새 cluster
+    - 대표 용어(cluster 첫 용어)끼리만 비교 → 유사 용어가 사슬처럼 이어져 cluster가 번지지 않음
+    - 숫자/한 글자/로마 숫자 토큰이 다르면 철자가 비슷해도 다른 진단
+    - 후보는 (trigram 개수, gram) posting list로만 찾음 (전체 쌍 비교 없음)
+    """
+
+    def __init__(self, threshold: float = 0.8):
+        self.threshold = float(threshold)
+        self.terms: List[str] = []
+        self.clusters: List[int] = []
+        self._ids: Dict[str, int] = {}
+        self._seen: Dict[str, int] = {}  # 원문 → cluster (정규화 생략용)
+        self._grams: Dict[int, set] = {}  # 대표 용어 id → trigram 집합
+        self._markers: Dict[int, tuple] = {}  # 대표 용어 id → _marker_tokens
+        self._postings: Dict[int, Dict[str, List[int]]] = {}  # trigram 개수 → gram → 대표 용어 id
+        self._gram_freq: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def best_match(self, term: str) -> Optional[int]:
+        """
+        정규화된 term과 가장 유사한 대표 용어 id (threshold 미만이거나 marker 토큰이 다르면 None)
+        - Dice ≥ t 가 가능한 trigram 개수 s 범위만 탐색
+        - 크기 s별 최소 공유 gram 수 τ → 전체 빈도가 낮은 (|A| − τ + 1)개 gram의 posting만
+          후보로 모으고(pigeonhole), 후보는 trigram 집합 교집합으로 검증
+        """
+        grams = _trigrams(term)
+        markers = _marker_tokens(term)
+        n_a, t = len(grams), self.threshold
+        s_lo = max(1, math.ceil(n_a * t / (2.0 - t) - 1e-9))
+        s_hi = math.floor(n_a * (2.0 - t) / t + 1e-9)
+        probe = sorted(grams, key=lambda g: self._gram_freq.get(g, 0))
+        best, best_score = None, t
+        for size in range(s_lo, s_hi + 1):
+            by_gram = self._postings.get(size)
+            if by_gram is None:
+                continue
+            tau = math.ceil(t * (n_a + size) / 2.0 - 1e-9)
+            candidates = set()
+            for g in probe[:n_a - tau + 1]:
+                ids = by_gram.get(g)
+                if ids:
+                    candidates.update(ids)
+            for tid in candidates:
+                if self._markers[tid] != markers:
+                    continue
+                score = 2.0 * len(grams & self._grams[tid]) / (n_a + size)
+                # 동점이면 먼저 색인된 용어 우선
+                if score > best_score or (score == best_score and (best is None or tid < best)):
+                    best, best_score = tid, score
+        return best
+
+    def add(self, text: str) -> int:
+        """용어를 색인에 넣고 cluster id 반환 (빈 문자열은 -1)"""
+        cid = self._seen.get(text)
+        if cid is not None:
+            return cid
+        term = normalize_term(text)
+        if not term:
+            cid = -1
+        elif term in self._ids:
+            cid = self.clusters[self._ids[term]]
+        else:
+            cid = self._insert(term)
+        self._seen[text] = cid
+        return cid
+
+    def _insert(self, term: str) -> int:
+        match = self.best_match(term)
+        tid = len(self.terms)
+        self.terms.append(term)
+        self._ids[term] = tid
+        if match is not None:
+            # 기존 cluster에 합류 — 대표가 아니므로 색인하지 않음
+            self.clusters.append(self.clusters[match])
+            return self.clusters[tid]
+        self.clusters.append(tid)
+        grams = _trigrams(term)
+        self._grams[tid] = grams
+        self._markers[tid] = _marker_tokens(term)
+        by_gram = self._postings.setdefault(len(grams), {})
+        for g in grams:
+            by_gram.setdefault(g, []).append(tid)
+            self._gram_freq[g] = self._gram_freq.get(g, 0) + 1
+        return tid
+
+    def encode(self, items: Sequence[str]) -> List[int]:
+        """리스트 → cluster id 리스트 (순서 유지, 중복 제거)"""
+        out = [self.add(x) for x in items]
+        return list(dict.fromkeys(c for c in out if c >= 0))
+
+
+# ───────────────── list metrics (cluster id 리스트 기준) ─────────────────
+def jaccard(a: Sequence[int], b: Sequence[int]) -> float:
+    sa, sb = set(a), set(b)
+    if not sa and not sb:
+        return float("nan")
+    return len(sa & sb) / len(sa | sb)
+
+
+def rank_overlap(a: Sequence[int], b: Sequence[int], p: float = 0.9) -> float:
+    """정규화된 truncated rank-biased overlap: Σ p^(d-1)·|A[:d]∩B[:d]|/d / Σ p^(d-1)"""
+    depth = max(len(a), len(b))
+    if depth == 0:
+        return float("nan")
+    seen_a, seen_b = set(), set()
+    overlap, num, den = 0, 0.0, 0.0
+    for d in range(depth):
+        x = a[d] if d < len(a) else None
+        y = b[d] if d < len(b) else None
+        if x is not None and x == y:
+            overlap += 1
+        else:
+            overlap += (x is not None and x in seen_b) + (y is not None and y in seen_a)
+        if x is not None:
+            seen_a.add(x)
+        if y is not None:
+            seen_b.add(y)
+        w = p ** d
+        num += w * overlap / (d + 1)
+        den += w
+    return num / den
+
+
+def _phys_list(val: Any) -> List[str]:
+    # 세션 레코드는 list, CSV에서 읽으면 "['a', 'b']" 문자열
+    if isinstance(val, list):
+        return [str(x) for x in val]
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return []
+    s = str(val).strip()
+    if s.startswith("["):
+        try:
+            y = ast.literal_eval(s)
+            if isinstance(y, list):
+                return [str(x) for x in y]
+        except Exception:
+            pass
+    return to_list_from_any(s)
+
+
+def _model_list(exp: Any, diffs: Any) -> List[str]:
+    exp = exp if isinstance(exp, str) else ""
+    diffs = diffs if isinstance(diffs, list) else []
+    return list(dict.fromkeys(([exp] if exp else []) + diffs))
+
+
+def overlap_metrics(
+    df_eval: pd.DataFrame,
+    df_all: pd.DataFrame,
+    *,
+    arms: Optional[Sequence[str]] = None,
+    threshold: float = 0.8,
+    top_k: Sequence[int] = (1, 3, 5),
+    p: float = 0.9,
+    index: Optional[TermIndex] = None,
+) -> pd.DataFrame:
+    """
+    평가 레코드(phys_ddx, row_id)별로 physician/모델 DDX overlap 지표 일괄 계산
+    - {arm}_expected_in_phys : 모델 Expected가 physician 리스트에 포함
+    - {arm}_top{k}           : physician 1순위가 모델 리스트 상위 k개에 포함
+    - phys_{arm}_jaccard / phys_{arm}_rbo, 그리고 arm 쌍끼리 jaccard / rbo
+    - arms 미지정 시 df_all의 arm 전체
+    """
+    arms = list(arms) if arms is not None else frame_arms(df_all)
+    index = index if index is not None else TermIndex(threshold)
+    if df_eval.empty or "row_id" not in df_eval.columns:
+        return pd.DataFrame()
+    ev = df_eval[df_eval["row_id"].isin(df_all.index)]
+    row_ids = ev["row_id"].astype(int).tolist()
+    phys_col = ev["phys_ddx"].tolist() if "phys_ddx" in ev.columns else [[]] * len(ev)
+
+    # arm별 Expected / Differentials를 컬럼 단위로 한 번에 꺼냄
+    cols = [c for arm in arms for c in (f"__exp_name_{arm}__", f"__ddx_names_{arm}__") if c in df_all.columns]
+    rows = df_all.loc[row_ids, ["file_name"] + cols]
+    arm_lists: Dict[str, List[List[int]]] = {}
+    arm_exp: Dict[str, List[int]] = {}
+    for arm in arms:
+        exps = rows.get(f"__exp_name_{arm}__", pd.Series("", index=rows.index)).tolist()
+        diffs = rows.get(f"__ddx_names_{arm}__", pd.Series([[]] * len(rows), index=rows.index)).tolist()
+        arm_lists[arm] = [index.encode(_model_list(e, d)) for e, d in zip(exps, diffs)]
+        arm_exp[arm] = [index.add(e) if isinstance(e, str) else -1 for e in exps]
+
+    recs = []
+    for i, (rid, fname, phys_val) in enumerate(zip(row_ids, rows["file_name"].tolist(), phys_col)):
+        phys = index.encode(_phys_list(phys_val))
+        out: Dict[str, Any] = {"row_id": rid, "file_name": fname, "n_phys": len(phys)}
+        for arm in arms:
+            model, exp_c = arm_lists[arm][i], arm_exp[arm][i]
+            out[f"{arm}_expected_in_phys"] = float(exp_c in phys) if exp_c >= 0 and phys else np.nan
+            for k in top_k:
+                out[f"{arm}_top{k}"] = float(phys[0] in model[:k]) if phys and model else np.nan
+            out[f"phys_{arm}_jaccard"] = jaccard(phys, model) if phys else np.nan
+            out[f"phys_{arm}_rbo"] = rank_overlap(phys, model, p) if phys else np.nan
+        for j, a in enumerate(arms):
+            for b in arms[j + 1:]:
+                out[f"{a}_{b}_jaccard"] = jaccard(arm_lists[a][i], arm_lists[b][i])
+                out[f"{a}_{b}_rbo"] = rank_overlap(arm_lists[a][i], arm_lists[b][i], p)
+        recs.append(out)
+    return pd.DataFrame(recs)
+
+
+def render_overlap_panel(session_rows: List[dict], df_all: pd.DataFrame):
+    """세션 평가의 Physician DDX와 모델 리스트 간 overlap 지표"""
+    with st.expander("DDX overlap metrics (Physician vs Model)", expanded=False):
+        if not session_rows:
+            st.caption("No evaluations yet.")
+            return
+        c1, c2 = st.columns(2)
+        with c1:
+            threshold = st.slider("Fuzzy match threshold (trigram Dice)", 0.5, 1.0, 0.8, 0.05, key="OVERLAP_THRESHOLD")
+        with c2:
+            p = st.slider("Rank weight p (RBO)", 0.5, 0.99, 0.9, 0.01, key="OVERLAP_P")
+        if not st.button("Compute overlap metrics", key="OVERLAP_RUN", use_container_width=True):
+            return
+
+        metrics = overlap_metrics(pd.DataFrame(session_rows), df_all, threshold=threshold, p=p)
+        if metrics.empty:
+            st.write("—")
+            return
+        value_cols = [c for c in metrics.columns if c not in ("row_id", "file_name", "n_phys")]
+        summary = metrics[value_cols].agg(["mean", "count"]).T.reset_index().rename(columns={"index": "metric"})
+        st.dataframe(summary.round(4), use_container_width=True, hide_index=True)
+        st.dataframe(metrics.round(4), use_container_width=True, height=220, hide_index=True)
+        st.download_button(
+            "Download overlap metrics (CSV)",
+            data=metrics.to_csv(index=False).encode("utf-8-sig"),
+            file_name="ddx_overlap_metrics.csv",
+            mime="text/csv",
+            use_container_width=True,
+        )
@@ -1,18 +1,62 @@
 # nav.py
+import re
+
 import streamlit as st
 
+from columns import frame_arms
+
 def row_key_of(selected_idx: int) -> str:
     return f"row_{int(selected_idx)}"
 
+PREFIXES = ("PHYS_DDX_", "HIST_SCORE_", "COMMENT_")
+# arm별 리커트 키: {BASE|APP|ARM_<arm>}_{QLT|COMP|APPR}_{row}
+ARM_CODES = ("_QLT_", "_COMP_", "_APPR_")
+
+_ROW_KEY_RE = re.compile(r"^(.*)row_(\d+)$")
+
+def _is_row_input(k: str) -> bool:
+    return any(k.startswith(p) for p in PREFIXES) or any(c in k for c in ARM_CODES)
+
 def reset_inputs_for_row(prev_row_key: str):
-    PREFIXES = (
-        "PHYS_DDX_", "BASE_QLT_", "BASE_COMP_", "BASE_APPR_",
-        "APP_QLT_", "APP_COMP_", "APP_APPR_", "HIST_SCORE_", "COMMENT_",
-    )
     for k in list(st.session_state.keys()):
-        if k.endswith(prev_row_key) and any(k.startswith(p) for p in PREFIXES):
+        if not k.endswith(prev_row_key):
+            continue
+        if _is_row_input(k):
             st.session_state.pop(k, None)
 
+def remap_row_state(index_map: dict):
+    """
+    증분 새로고침 후 행 인덱스에 묶인 세션 상태를 새 인덱스로 이동
+    - 행별 입력 키(PHYS_DDX_row_N 등), CURRENT_ROW_KEY, CURRENT_PICK, ROW_NAV_TARGET
+    - 삭제된 행의 상태는 제거
+    """
+    moved = {}
+    for k in list(st.session_state.keys()):
+        m = _ROW_KEY_RE.match(str(k))
+        if m is None or not _is_row_input(k):
+            continue
+        val = st.session_state.pop(k)
+        new = index_map.get(int(m.group(2)))
+        if new is not None:
+            moved[f"{m.group(1)}{row_key_of(new)}"] = val
+    st.session_state.update(moved)
+
+    cur_key = st.session_state.get("CURRENT_ROW_KEY")
+    if cur_key is not None:
+        new = index_map.get(int(cur_key[len("row_"):]))
+        if new is None:
+            st.session_state.pop("CURRENT_ROW_KEY")
+        else:
+            st.session_state["CURRENT_ROW_KEY"] = row_key_of(new)
+    for k in ("CURRENT_PICK", "ROW_NAV_TARGET"):
+        if k not in st.session_state:
+            continue
+        new = index_map.get(st.session_state[k])
+        if new is None:
+            st.session_state.pop(k)
+        else:
+            st.session_state[k] = new
+
 def reset_inputs_for_row_if_changed(selected_idx: int):
     prev = st.session_state.get("CURRENT_ROW_KEY")
     curr = row_key_of(selected_idx)
@@ -22,19 +66,28 @@ def reset_inputs_for_row_if_changed(selected_idx: int):
         st.session_state["CURRENT_ROW_KEY"] = curr
 
 # 라벨 폴백 헬퍼
-def _row_title(df, i):
+def _title_columns(df):
+    # 우선순위: Label → applied → 나머지 arm 순서 (각각 __exp_name_<arm>__ → Expected Diagnosis (<arm>))
+    arms = sorted(frame_arms(df), key=lambda a: a != "applied")
+    cols = ["Label"]
+    for arm in arms:
+        cols += [f"__exp_name_{arm}__", f"Expected Diagnosis ({arm})"]
+    return [c for c in cols if c in df.columns]
+
+def _row_title(df, i, title_cols):
     fn = str(df.loc[i, "file_name"])
-    # 우선순위: Label → __exp_name_applied__ → Expected Diagnosis (applied) → __exp_name_base__ → Expected Diagnosis (base)
-    for c in ("Label", "__exp_name_applied__", "Expected Diagnosis (applied)",
-              "__exp_name_base__", "Expected Diagnosis (base)"):
-        if c in df.columns:
-            val = str(df.loc[i, c])
-            if val and val.lower() != "nan":
-                return f"{fn} — {val[:40]}"
+    for c in title_cols:
+        val = str(df.loc[i, c])
+        if val and val.lower() != "nan":
+            return f"{fn} — {val[:40]}"
     return fn
 
-def render_row_picker(filtered_df):
-    id_options = list(filtered_df.index)
+def render_row_picker(df, row_ids=None):
+    """
+    df: 전체 프레임, row_ids: 필터 결과 인덱스 배열 (None이면 전체)
+    - 필터된 사본 없이 인덱스 배열로 탐색
+    """
+    id_options = list(df.index if row_ids is None else row_ids)
     if len(id_options) == 0:
         st.info("No rows after filtering. Adjust filters to see results.")
         return False, None, None
@@ -51,6 +104,7 @@ def render_row_picker(filtered_df):
         current_pick = id_options[0]
         st.session_state["CURRENT_PICK"] = current_pick
 
+    title_cols = _title_columns(df)
     sel_col, prev_col, next_col = st.columns([6, 1, 1])
     with prev_col:
         if st.button("◀ Prev", use_container_width=True, disabled=(pos <= 0)):
@@ -65,9 +119,9 @@ def render_row_picker(filtered_df):
             "Select a row",
             options=id_options,
             index=pos,
-            format_func=lambda i: _row_title(filtered_df, i),  # KeyError 방지
+            format_func=lambda i: _row_title(df, i, title_cols),  # KeyError 방지
         )
 
     st.session_state["CURRENT_PICK"] = selected_idx
-    row = filtered_df.loc[selected_idx]
+    row = df.loc[selected_idx]
     return True, selected_idx, row
\ No newline at end of file
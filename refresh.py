@@ -0,0 +1,164 @@
+# refresh.py
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from columns import arm_source_columns, backfill_from_raw
+from textstore import LONG_TEXT_COLUMNS
+
+# ─────────────────────────────────────────────────────────────
+# 증분 새로고침
+#    - 같은 결과 CSV의 새 버전을 행 단위 content hash로 기존 데이터와 비교
+#    - 새로 생기거나 바뀐 행만 backfill_from_raw 재실행, 나머지는 파생 컬럼 재사용
+#    - 평가(row_id)를 새 인덱스로 옮기고, 모델 출력이 바뀐 행의 평가는 표시
+# ─────────────────────────────────────────────────────────────
+KEY_COLUMN = "file_name"
+
+
+def _is_derived(col: str) -> bool:
+    return col.startswith("__")
+
+
+def _hash_rows(df: pd.DataFrame, cols: List[str]) -> np.ndarray:
+    if not cols:
+        return np.zeros(len(df), dtype=np.uint64)
+    return pd.util.hash_pandas_object(df[sorted(cols)], index=False).to_numpy()
+
+
+def fingerprint(df: pd.DataFrame, text_hash: Optional[np.ndarray] = None) -> pd.DataFrame:
+    """
+    normalize_columns 직후(backfill 이전) 프레임의 행 지문
+    - key    : file_name (중복 가능 — 짝짓기는 diff_versions에서 content와 함께)
+    - content: 원본 컬럼 전체 hash
+      (자유기술 컬럼은 따로 hash해 합침 → 로드 중 압축해 빠진 경우 text_hash로 받아 같은 값)
+    - model  : 모델 출력 컬럼(모든 arm의 llm_eval_raw / Expected / Differential) hash
+    """
+    keys = df[KEY_COLUMN].astype(str) if KEY_COLUMN in df.columns else pd.Series("", index=df.index)
+
+    text_cols = [c for c in LONG_TEXT_COLUMNS if c in df.columns]
+    if text_hash is None and text_cols:
+        text_hash = _hash_rows(df, text_cols)
+    raw_cols = [c for c in df.columns if not _is_derived(c) and c not in text_cols]
+    model_cols = arm_source_columns(df.columns)
+    content = _hash_rows(df, raw_cols)
+    if text_hash is not None:
+        content = pd.util.hash_pandas_object(
+            pd.DataFrame({"content": content, "text": text_hash}), index=False
+        ).to_numpy()
+    return pd.DataFrame(
+        {
+            "key": keys.to_numpy(),
+            "content": content,
+            "model": _hash_rows(df, model_cols),
+        },
+        index=df.index,
+    )
+
+
+def _pair(old: pd.DataFrame, new: pd.DataFrame, on: List[str]) -> pd.DataFrame:
+    """on 값이 같은 행끼리 그룹 내 등장 순서대로 짝지음 → old_idx / new_idx / model_old / model_new"""
+    old = old.assign(_occ=old.groupby(on, sort=False).cumcount())
+    new = new.assign(_occ=new.groupby(on, sort=False).cumcount())
+    return pd.merge(old, new, on=on + ["_occ"], suffixes=("_old", "_new"))
+
+
+def _ids(s: pd.Series, dtype) -> List[Any]:
+    return s.astype(dtype).tolist()
+
+
+def diff_versions(old_fp: pd.DataFrame, new_fp: pd.DataFrame) -> Dict[str, Any]:
+    """
+    두 지문 비교 → added/changed/unchanged/removed 및 old→new 인덱스 매핑
+    1) (file_name, content)가 같은 행끼리 짝 → unchanged
+    2) 남은 행은 file_name별로: 양쪽 남은 개수가 같으면 순서대로 짝 → changed,
+       다르면(중복 file_name 중 일부 삭제/추가) 어느 행이 어느 행인지 모호하므로 removed + added
+    """
+    old = old_fp.rename_axis("old_idx").reset_index()
+    new = new_fp.rename_axis("new_idx").reset_index()
+
+    same = _pair(old, new, ["key", "content"])
+    rest_old = old[~old["old_idx"].isin(same["old_idx"])]
+    rest_new = new[~new["new_idx"].isin(same["new_idx"])]
+
+    n_old, n_new = rest_old["key"].value_counts(), rest_new["key"].value_counts()
+    paired_keys = n_old.index[n_old.eq(n_new.reindex(n_old.index))]
+    changed = _pair(
+        rest_old[rest_old["key"].isin(paired_keys)].drop(columns="content"),
+        rest_new[rest_new["key"].isin(paired_keys)].drop(columns="content"),
+        ["key"],
+    )
+    model_changed = changed["model_old"] != changed["model_new"]
+
+    od, nd = old_fp.index.dtype, new_fp.index.dtype
+    return {
+        "added": _ids(rest_new.loc[~rest_new["new_idx"].isin(changed["new_idx"]), "new_idx"], nd),
+        "changed": _ids(changed["new_idx"], nd),
+        "unchanged": _ids(same["new_idx"], nd),
+        "removed": _ids(rest_old.loc[~rest_old["old_idx"].isin(changed["old_idx"]), "old_idx"], od),
+        "index_map": dict(zip(
+            _ids(pd.concat([same["old_idx"], changed["old_idx"]]), od),
+            _ids(pd.concat([same["new_idx"], changed["new_idx"]]), nd),
+        )),
+        "model_changed": set(_ids(changed.loc[model_changed, "new_idx"], nd)),
+    }
+
+
+def incremental_refresh(
+    old_df: pd.DataFrame,
+    old_fp: pd.DataFrame,
+    new_df: pd.DataFrame,
+    new_fp: pd.DataFrame,
+    prefer: str = "applied",
+    *,
+    lean: bool = False,
+) -> Tuple[pd.DataFrame, Dict[str, Any]]:
+    """
+    - new_df: normalize_columns 직후 프레임 (제자리에서 파생 컬럼이 추가됨)
+    - 바뀌지 않은 행은 old_df의 파생(__*) 컬럼을 그대로 가져오고, 나머지만 파싱
+    - 파생 컬럼 구성이 달라졌으면(lean 전환 등) 전체 재파싱
+    """
+    diff = diff_versions(old_fp, new_fp)
+    old_derived = [c for c in old_df.columns if _is_derived(c)]
+
+    reparse = diff["added"] + diff["changed"]
+    subset = new_df.loc[reparse].copy() if lean else new_df.loc[reparse]
+    parsed = backfill_from_raw(subset, prefer=prefer, lean=lean)
+    derived = [c for c in parsed.columns if _is_derived(c)]
+    if derived != old_derived:
+        diff["unchanged"], diff["changed"] = [], diff["changed"] + diff["unchanged"]
+        return backfill_from_raw(new_df, prefer=prefer, lean=lean), diff
+
+    inv = {new: old for old, new in diff["index_map"].items()}
+    reused = old_df.loc[[inv[i] for i in diff["unchanged"]], derived]
+    reused.index = pd.Index(diff["unchanged"], dtype=new_df.index.dtype)
+
+    combined = pd.concat([parsed[derived], reused]).reindex(new_df.index)
+    for c in derived:
+        new_df[c] = combined[c]
+    return new_df, diff
+
+
+def remap_evaluations(records: List[Dict[str, Any]], diff: Dict[str, Any]) -> int:
+    """
+    평가 레코드의 row_id를 새 인덱스로 변경 (제자리 수정)
+    - 삭제된 행: row_id=None, row_removed=True
+    - 모델 출력이 바뀐 행: model_output_changed=True
+    반환: 표시된(삭제/변경) 평가 수
+    """
+    flagged = 0
+    for rec in records:
+        old = rec.get("row_id")
+        if old is None:
+            continue
+        if old not in diff["index_map"]:
+            rec["row_id"] = None
+            rec["row_removed"] = True
+            flagged += 1
+            continue
+        new = diff["index_map"][old]
+        rec["row_id"] = int(new)
+        if new in diff["model_changed"]:
+            rec["model_output_changed"] = True
+            flagged += 1
+    return flagged
@@ -0,0 +1,69 @@
+# test_refresh.py
+import pandas as pd
+
+from columns import normalize_columns
+from refresh import diff_versions, fingerprint, remap_evaluations
+
+
+def _frame(rows):
+    df = pd.DataFrame(rows, columns=["file_name", "Current History", "expected_diagnosis_applied"])
+    return normalize_columns(df)
+
+
+OLD = [
+    ("a.txt", "hx a", "Dx A"),
+    ("f1.txt", "hx 1", "Dx 1"),
+    ("b.txt", "hx b", "Dx B"),
+    ("f1.txt", "hx 2", "Dx 2"),
+    ("f1.txt", "hx 3", "Dx 3"),
+    ("c.txt", "hx c", "Dx C"),
+]
+
+
+def test_earlier_duplicate_removed():
+    # 첫 번째 f1.txt 삭제 + 무관한 행(b.txt) 한 칸 수정
+    new = [OLD[0], ("b.txt", "hx b (edited)", "Dx B"), OLD[3], OLD[4], OLD[5]]
+    diff = diff_versions(fingerprint(_frame(OLD)), fingerprint(_frame(new)))
+
+    assert diff["removed"] == [1]
+    assert diff["added"] == []
+    assert diff["changed"] == [1]
+    assert sorted(diff["unchanged"]) == [0, 2, 3, 4]
+    assert diff["index_map"] == {0: 0, 2: 1, 3: 2, 4: 3, 5: 4}
+    assert diff["model_changed"] == set()
+
+    records = [{"row_id": 1}, {"row_id": 4}]
+    assert remap_evaluations(records, diff) == 1
+    assert records[0] == {"row_id": None, "row_removed": True}
+    assert records[1] == {"row_id": 3}
+
+
+def test_ambiguous_duplicates_not_paired():
+    # 중복 file_name 중 하나 삭제 + 다른 하나 수정 → 어느 행인지 모호하므로 짝짓지 않음
+    new = [OLD[0], OLD[2], ("f1.txt", "hx 2", "Dx 2 revised"), OLD[4], OLD[5]]
+    diff = diff_versions(fingerprint(_frame(OLD)), fingerprint(_frame(new)))
+
+    assert sorted(diff["removed"]) == [1, 3]
+    assert diff["added"] == [2]
+    assert diff["changed"] == []
+    assert diff["index_map"] == {0: 0, 2: 1, 4: 3, 5: 4}
+
+
+def test_edited_duplicates_paired_in_order():
+    new = [OLD[0], ("f1.txt", "hx 1", "Dx 1 revised"), OLD[2], OLD[3], OLD[4], OLD[5]]
+    diff = diff_versions(fingerprint(_frame(OLD)), fingerprint(_frame(new)))
+
+    assert diff["changed"] == [1]
+    assert diff["removed"] == [] and diff["added"] == []
+    assert diff["model_changed"] == {1}
+    assert diff["index_map"] == {i: i for i in range(6)}
+
+
+def test_legacy_model_columns_flag_model_change():
+    # applied arm이 구버전 통합 컬럼(Expected Diagnosis)에서만 채워지는 경우
+    old = normalize_columns(pd.DataFrame({"file_name": ["a.txt"], "Expected Diagnosis": ["Gout"]}))
+    new = normalize_columns(pd.DataFrame({"file_name": ["a.txt"], "Expected Diagnosis": ["Septic arthritis"]}))
+    diff = diff_versions(fingerprint(old), fingerprint(new))
+
+    assert diff["changed"] == [0]
+    assert diff["model_changed"] == {0}
@@ -0,0 +1,250 @@
+# textstore.py
+import io
+import zlib
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:  # zstd가 있으면 사용, 없으면 zlib
+    import zstandard as _zstd
+except ImportError:
+    _zstd = None
+
+# ─────────────────────────────────────────────────────────────
+# 긴 자유기술 컬럼 압축 저장
+#    - 행 묶음(block) 단위로 압축 → 표시/검색 시에만 해제
+#    - 최근 해제한 블록은 작은 LRU 캐시에 보관, 검색 결과(mask)도 검색어별로 보관
+#    - read_csv_compressed: CSV를 chunk 단위로 읽으면서 바로 압축 (로드 중 최대 메모리 절감)
+# ─────────────────────────────────────────────────────────────
+LONG_TEXT_COLUMNS = ("원본 초진기록", "Current History", "Past History")
+
+# 검색어별 mask 캐시 크기 (컬럼당)
+_QUERY_CACHE = 4
+
+_SEP = "\x00"  # 블록 내 행 구분자 (본문에서는 제거)
+
+
+def _compress(data: bytes) -> bytes:
+    if _zstd is not None:
+        return _zstd.ZstdCompressor(level=3).compress(data)
+    return zlib.compress(data, 6)
+
+
+def _decompress(data: bytes) -> bytes:
+    if _zstd is not None:
+        return _zstd.ZstdDecompressor().decompress(data)
+    return zlib.decompress(data)
+
+
+def _as_text(val) -> str:
+    if val is None or (isinstance(val, float) and pd.isna(val)):
+        return ""
+    return str(val).replace(_SEP, "")
+
+
+class CompressedTextColumn:
+    """문자열 컬럼 하나를 block_rows 행씩 묶어 압축 보관 (위치 기반 접근)"""
+
+    def __init__(self, values: Iterable = (), block_rows: int = 512, cache_blocks: int = 8):
+        self.block_rows = int(block_rows)
+        self.cache_blocks = int(cache_blocks)
+        self._blocks: List[bytes] = []
+        self._cache: "OrderedDict[int, List[str]]" = OrderedDict()
+        self._hits: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._n = 0
+        self._buf: List[str] = []
+        self.extend(values)
+        self.close()
+
+    def extend(self, values: Iterable):
+        """행 추가 (꽉 찬 블록만 압축, 나머지는 close()에서)"""
+        for v in values:
+            self._buf.append(_as_text(v))
+            if len(self._buf) == self.block_rows:
+                self._flush()
+
+    def close(self):
+        """마지막 (덜 찬) 블록 압축 — 추가가 끝난 뒤 한 번"""
+        if self._buf:
+            self._flush()
+
+    def _flush(self):
+        self._blocks.append(_compress(_SEP.join(self._buf).encode("utf-8")))
+        self._n += len(self._buf)
+        self._buf = []
+        self._hits.clear()
+
+    def __len__(self) -> int:
+        return self._n
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(b) for b in self._blocks)
+
+    def _load(self, b: int) -> List[str]:
+        return _decompress(self._blocks[b]).decode("utf-8").split(_SEP)
+
+    def _block(self, b: int) -> List[str]:
+        rows = self._cache.get(b)
+        if rows is not None:
+            self._cache.move_to_end(b)
+            return rows
+        rows = self._load(b)
+        self._cache[b] = rows
+        if len(self._cache) > self.cache_blocks:
+            self._cache.popitem(last=False)
+        return rows
+
+    def get(self, pos: int) -> str:
+        b, off = divmod(int(pos), self.block_rows)
+        return self._block(b)[off]
+
+    def take(self, positions: Sequence[int]) -> List[str]:
+        """
+        여러 행 일괄 조회 (export 등 대량 접근용)
+        - 블록당 한 번만 해제하고, 표시용 LRU 캐시는 읽기만 함 (밀어내지 않음)
+        """
+        loaded: Dict[int, List[str]] = {}
+        out: List[str] = []
+        for p in positions:
+            b, off = divmod(int(p), self.block_rows)
+            rows = loaded.get(b)
+            if rows is None:
+                rows = self._cache.get(b) or self._load(b)
+                loaded[b] = rows
+            out.append(rows[off])
+        return out
+
+    def preview(self, positions: Sequence[int], width: int = 80) -> List[str]:
+        """앞 width 글자 미리보기 (줄바꿈 → 공백)"""
+        out = []
+        for text in self.take(positions):
+            text = " ".join(text[:width + 1].split())
+            out.append(text if len(text) <= width else text[:width - 1] + "…")
+        return out
+
+    def contains(self, query: str) -> np.ndarray:
+        """
+        대소문자 무시 부분문자열 검색 (표시용 캐시는 건드리지 않음)
+        - 같은 검색어는 rerun마다 다시 풀지 않도록 mask를 보관 (읽기 전용으로 반환)
+        """
+        q = query.lower()
+        mask = self._hits.get(q)
+        if mask is not None:
+            self._hits.move_to_end(q)
+            return mask
+        mask = self._search(q)
+        mask.flags.writeable = False
+        self._hits[q] = mask
+        if len(self._hits) > _QUERY_CACHE:
+            self._hits.popitem(last=False)
+        return mask
+
+    def _search(self, q: str) -> np.ndarray:
+        mask = np.zeros(self._n, dtype=bool)
+        if not q:
+            return mask
+        for b in range(len(self._blocks)):
+            rows = self._cache.get(b) or self._load(b)
+            # 블록 전체에 없으면 행 단위 비교 생략
+            if q not in _SEP.join(rows).lower():
+                continue
+            start = b * self.block_rows
+            for off, text in enumerate(rows):
+                if q in text.lower():
+                    mask[start + off] = True
+        return mask
+
+
+class CompressedTextStore:
+    """프레임 인덱스(label)로 접근하는 압축 컬럼 묶음"""
+
+    def __init__(self, index: pd.Index, columns: Dict[str, CompressedTextColumn], positions: Dict[str, int]):
+        self.index = index
+        self.columns = columns
+        self.positions = positions  # 원래 컬럼 위치 (export 복원용)
+
+    def __contains__(self, col: str) -> bool:
+        return col in self.columns
+
+    @property
+    def nbytes(self) -> int:
+        return sum(c.nbytes for c in self.columns.values())
+
+    def get(self, col: str, label) -> str:
+        return self.columns[col].get(self.index.get_loc(label))
+
+    def contains(self, col: str, query: str) -> np.ndarray:
+        return self.columns[col].contains(query)
+
+    def preview(self, col: str, labels: Sequence, width: int = 80) -> List[str]:
+        return self.columns[col].preview(self.index.get_indexer(labels), width)
+
+    def materialize(self, df: pd.DataFrame) -> pd.DataFrame:
+        """df(전체 또는 부분 행)에 압축 컬럼을 풀어서 원래 위치에 복원한 새 프레임"""
+        out = df.copy()
+        pos = self.index.get_indexer(df.index)
+        for col in sorted(self.columns, key=lambda c: self.positions[c]):
+            loc = min(self.positions[col], len(out.columns))
+            out.insert(loc, col, self.columns[col].take(pos))
+        return out
+
+    def to_csv(self, df: pd.DataFrame, chunk_rows: int = 4096) -> str:
+        """
+        압축 컬럼을 복원한 CSV 문자열
+        - chunk_rows 행씩 복원 → CSV 기록 (풀린 텍스트 전체를 한꺼번에 들고 있지 않음)
+        """
+        buf = io.StringIO()
+        if len(df) == 0:
+            self.materialize(df).to_csv(buf, index=False)
+        for start in range(0, len(df), chunk_rows):
+            part = self.materialize(df.iloc[start:start + chunk_rows])
+            part.to_csv(buf, index=False, header=(start == 0))
+        return buf.getvalue()
+
+
+def read_csv_compressed(
+    source,
+    columns: Sequence[str] = LONG_TEXT_COLUMNS,
+    *,
+    prepare: Optional[Callable[[pd.DataFrame], pd.DataFrame]] = None,
+    chunk_rows: int = 50_000,
+    block_rows: int = 512,
+    cache_blocks: int = 8,
+) -> Tuple[pd.DataFrame, Optional[CompressedTextStore], Optional[np.ndarray]]:
+    """
+    CSV를 chunk_rows 행씩 읽으며 columns를 곧바로 압축 저장소로 옮김
+    - 자유기술 원문 전체가 한꺼번에 메모리에 올라오지 않음
+    - prepare: chunk별 전처리 (컬럼 정규화 등, 압축 대상 선택 전에 적용)
+    - 반환: (압축 컬럼을 뺀 프레임, 저장소, 압축 컬럼의 행 hash) — 대상이 없으면 저장소/hash는 None
+    """
+    parts: List[pd.DataFrame] = []
+    hashes: List[np.ndarray] = []
+    store_cols: Dict[str, CompressedTextColumn] = {}
+    positions: Dict[str, int] = {}
+    for chunk in pd.read_csv(source, dtype=str, chunksize=chunk_rows):
+        chunk.fillna("", inplace=True)
+        if prepare is not None:
+            chunk = prepare(chunk)
+        if not parts:
+            cols = [c for c in columns if c in chunk.columns]
+            positions = {c: chunk.columns.get_loc(c) for c in cols}
+            store_cols = {c: CompressedTextColumn(block_rows=block_rows, cache_blocks=cache_blocks) for c in cols}
+        if store_cols:
+            hashes.append(pd.util.hash_pandas_object(chunk[sorted(store_cols)], index=False).to_numpy())
+            for c, col in store_cols.items():
+                col.extend(chunk[c])
+            chunk.drop(columns=list(store_cols), inplace=True)
+        parts.append(chunk)
+
+    # 헤더만 있는 CSV도 빈 chunk 하나가 나오므로 parts는 비어 있지 않음
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0].reset_index(drop=True)
+    del parts
+    if not store_cols:
+        return df, None, None
+    for col in store_cols.values():
+        col.close()
+    return df, CompressedTextStore(df.index, store_cols, positions), np.concatenate(hashes)
+
@@ -1,8 +1,11 @@
 # views.py
 import hashlib
+from typing import Sequence
 import pandas as pd
 import streamlit as st
 
+from columns import DEFAULT_ARMS, arm_label, get_derived
+
 
 def _row_toggle_key(row, suffix: str) -> str:
     # file_name 기반 키 (행마다 독립 토글)
@@ -11,8 +14,14 @@ def _row_toggle_key(row, suffix: str) -> str:
     return f"{suffix}_{h}"
 
 
+def _text_of(row: pd.Series, col: str, text_store=None, default: str = "") -> str:
+    # 압축 저장된 컬럼이면 해당 행만 해제해서 반환
+    if text_store is not None and col in text_store:
+        return text_store.get(col, row.name)
+    return row.get(col, default)
+
 
-def render_core_view(row: pd.Series):
+def render_core_view(row: pd.Series, text_store=None, arms: Sequence[str] = DEFAULT_ARMS):
     st.markdown("### Core View")
 
     # 모델 DDX 표 토글 버튼
@@ -24,41 +33,34 @@ def render_core_view(row: pd.Series):
         st.session_state[tkey] = not st.session_state[tkey]
 
     if st.session_state[tkey]:
-        lc, rc = st.columns(2)
-        with lc:
-            st.markdown("**Model (Base) — Expected + Differentials**")
-            rows = row.get("__ddx_table_base__") or []
-            if rows:
-                df_tbl = pd.DataFrame(rows)
-                # Tier 컬럼 제거
-                if "Tier" in df_tbl.columns:
-                    df_tbl = df_tbl.drop(columns=["Tier"])
-                st.table(df_tbl)
-            else:
-                st.write("—")
-
-        with rc:
-            st.markdown("**Model (Applied) — Expected + Differentials**")
-            rows = row.get("__ddx_table_applied__") or []
-            if rows:
-                df_tbl = pd.DataFrame(rows)
-                if "Tier" in df_tbl.columns:
-                    df_tbl = df_tbl.drop(columns=["Tier"])
-                st.table(df_tbl)
-            else:
-                st.write("—")
+        # arm 수에 맞춰 한 줄에 최대 3개씩
+        per_line = min(len(arms), 3) or 1
+        for start in range(0, len(arms), per_line):
+            cols = st.columns(per_line)
+            for col, arm in zip(cols, arms[start:start + per_line]):
+                with col:
+                    st.markdown(f"**Model ({arm_label(arm)}) — Expected + Differentials**")
+                    rows = get_derived(row, f"__ddx_table_{arm}__") or []
+                    if rows:
+                        df_tbl = pd.DataFrame(rows)
+                        # Tier 컬럼 제거
+                        if "Tier" in df_tbl.columns:
+                            df_tbl = df_tbl.drop(columns=["Tier"])
+                        st.table(df_tbl)
+                    else:
+                        st.write("—")
 
     # 하단 원본 초진기록
     st.markdown("**원본 초진기록**")
     st.text_area(
         "raw_visit",
-        row.get("원본 초진기록", row.get("현병력-Free Text#13", "")),
+        _text_of(row, "원본 초진기록", text_store, row.get("현병력-Free Text#13", "")),
         height=420,
         label_visibility="collapsed",
     )
 
 
-def render_optional_sections(row, *, show_past, show_current, show_asso_sx, show_asso_dx, show_asso_tx):
+def render_optional_sections(row, *, show_past, show_current, show_asso_sx, show_asso_dx, show_asso_tx, text_store=None):
     any_flag = any([show_past, show_current, show_asso_sx, show_asso_dx, show_asso_tx])
     if not any_flag:
         return
@@ -66,10 +68,10 @@ def render_optional_sections(row, *, show_past, show_current, show_asso_sx, show
     st.subheader("Optional Sections")
     if show_current:
         st.markdown("**Current History**")
-        st.text_area("opt_current", row.get("Current History", ""), height=160, label_visibility="collapsed")
+        st.text_area("opt_current", _text_of(row, "Current History", text_store), height=160, label_visibility="collapsed")
     if show_past:
         st.markdown("**Past History**")
-        st.text_area("opt_past", row.get("Past History", ""), height=160, label_visibility="collapsed")
+        st.text_area("opt_past", _text_of(row, "Past History", text_store), height=160, label_visibility="collapsed")
     if show_asso_sx:
         st.caption("ASSO_SX_SN")
         st.text_area("opt_sx", row.get("ASSO_SX_SN", ""), height=80, label_visibility="collapsed")